@@ -1,11 +1,18 @@
 import os
-import json
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import codecs
+import re
+import orjson
+from lxml import etree as ET
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import gzip
-from io import BytesIO
+import hashlib
 from datetime import datetime, timezone, timedelta # Importaciones de tiempo
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 
 # --- Fuentes de Datos ---
 SOURCE_URL_W3U = "https://github.com/HelmerLuzo/RakutenTV_HL/raw/refs/heads/main/tv/w3u/RakutenTV_tv.w3u"
@@ -23,24 +30,123 @@ XML_FILE = os.path.join(OUTPUT_DIR, "rakuten_all.xml")
 JSON_STATIONS_FILE = os.path.join(OUTPUT_DIR, "rakuten_all.json")
 JSON_INDEX_FILE = os.path.join(OUTPUT_DIR, "index.json")
 
+# --- Formato JSON (compacto por defecto; PRETTY_JSON=1 para depurar con sangría) ---
+PRETTY_JSON = os.environ.get("PRETTY_JSON") == "1"
+JSON_DUMP_OPTION = orjson.OPT_INDENT_2 if PRETTY_JSON else 0
+
+# --- Caché HTTP local (revalidada con ETag / Last-Modified) ---
+CACHE_DIR = ".cache"
+
+# --- Sesión HTTP compartida (reutiliza conexiones y reintenta errores temporales) ---
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+# requests ya anuncia gzip/deflate (y br si 'brotli' está instalado) y keep-alive
+SESSION.headers.update({
+    "User-Agent": "RakutenTV-M3U-Generator (+https://github.com/joaquinito2070/RakutenTV_M3U)",
+    "Accept": "application/json, application/gzip, */*",
+})
+
+
+@contextmanager
+def atomic_open(path):
+    """
+    Abre path + ".tmp" para escritura binaria y, al terminar sin errores, lo
+    sincroniza a disco y lo renombra sobre path con os.replace (atómico en POSIX).
+    Así nadie lee un archivo a medio escribir y un fallo no borra la versión anterior.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _cache_paths(url):
+    """Devuelve las rutas (metadatos, cuerpo) de la caché local para una URL."""
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.meta.json"), os.path.join(CACHE_DIR, f"{key}.body")
+
+
+def fetch_with_cache(url):
+    """
+    Descarga una URL a la caché local y devuelve la ruta del cuerpo guardado.
+    Si ya existe una copia, la revalida con If-None-Match / If-Modified-Since
+    y la reutiliza ante un 304. El cuerpo se vuelca a disco por bloques, sin
+    mantener la descarga completa en memoria.
+    """
+    meta_path, body_path = _cache_paths(url)
+    headers = {}
+
+    if os.path.exists(meta_path) and os.path.exists(body_path):
+        # Un sidecar ilegible o corrupto cuenta como fallo de caché: descarga completa
+        try:
+            with open(meta_path, "rb") as f:
+                meta = orjson.loads(f.read())
+            if not isinstance(meta, dict):
+                meta = {}
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    with SESSION.get(url, timeout=10, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            print(f"  -> Sin cambios en {url}, usando la copia en caché.")
+            return body_path
+
+        response.raise_for_status()
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with atomic_open(body_path) as f:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                f.write(chunk)
+
+        with atomic_open(meta_path) as f:
+            f.write(orjson.dumps({
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified")
+            }))
+
+    return body_path
+
 
 def get_data_from_source(url, is_gz=False):
-    """Descarga datos. Si is_gz es True, descomprime el contenido."""
+    """
+    Descarga datos. Si is_gz es True, devuelve un flujo descomprimido
+    para poder parsearlo en streaming; si no, el JSON ya decodificado.
+    """
     print(f"Descargando datos desde: {url}")
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+        body_path = fetch_with_cache(url)
 
         if is_gz:
-            with gzip.GzipFile(fileobj=BytesIO(response.content)) as f:
-                return f.read().decode('utf-8')
+            return gzip.open(body_path, "rb")
         else:
-            return response.json()
+            with open(body_path, "rb") as f:
+                content = f.read()
+            # orjson no acepta BOM; las listas editadas a mano a menudo lo llevan
+            if content.startswith(codecs.BOM_UTF8):
+                content = content[len(codecs.BOM_UTF8):]
+            return orjson.loads(content)
 
     except requests.exceptions.RequestException as e:
         print(f"ERROR: No se pudo descargar {url}. {e}")
         return None
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"ERROR: El archivo de {url} no es un JSON válido. {e}")
         return None
     except (IOError, EOFError, gzip.BadGzipFile) as e:
@@ -48,82 +154,178 @@ def get_data_from_source(url, is_gz=False):
         return None
 
 
+# 'YYYYMMDDHHMMSS' con desplazamiento opcional '+HHMM' (o '+HH:MM')
+_XMLTV_TIME_RE = re.compile(r"(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})(?:\s*([+-])(\d{2}):?(\d{2}))?\s*$")
+
+
+@lru_cache(maxsize=None)
+def _xmltv_timezone(sign, hours, minutes):
+    """Devuelve el objeto timezone para un desplazamiento XMLTV."""
+    offset = timedelta(hours=int(hours), minutes=int(minutes))
+    return timezone(-offset if sign == "-" else offset)
+
+
 def parse_xmltv_time(time_str):
-    """Convierte un timestamp de XMLTV a un objeto datetime."""
+    """
+    Convierte un timestamp de XMLTV ('YYYYMMDDHHMMSS' o 'YYYYMMDDHHMMSS +HHMM')
+    a un objeto datetime con una expresión regular precompilada, sin strptime.
+    """
+    match = _XMLTV_TIME_RE.match(time_str or "")
+    if not match:
+        return None
+
+    year, month, day, hour, minute, second, sign, off_hours, off_minutes = match.groups()
     try:
-        if " " in time_str:
-            parts = time_str.split(" ")
-            time_str_fixed = parts[0] + parts[1]
-            return datetime.strptime(time_str_fixed, '%Y%m%d%H%M%S%z')
-        else:
-            return datetime.strptime(time_str, '%Y%m%d%H%M%S').replace(tzinfo=timezone.utc)
-    except Exception:
+        tz = timezone.utc if sign is None else _xmltv_timezone(sign, off_hours, off_minutes)
+        return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), tzinfo=tz)
+    except ValueError:
         return None
 
 
-def get_filtered_programs(epg_root, hours_limit):
+def iter_epg_programs(epg_source):
     """
-    Devuelve una lista de elementos <programme> que están dentro 
-    del marco de tiempo especificado.
+    Recorre el EPG en streaming con iterparse y devuelve cada <programme>
+    ya separado del árbol, de modo que los descartados se liberan al momento
+    en lugar de mantener todo el documento en memoria.
     """
-    programs_list = []
-    programs_kept = 0
-    programs_filtered = 0
-    
-    now_utc = datetime.now(timezone.utc)
-    limit_time_utc = now_utc + timedelta(hours=hours_limit)
-    
-    if epg_root is None:
-        return []
+    context = ET.iterparse(
+        epg_source, events=("end",), tag="programme", remove_blank_text=True, huge_tree=True
+    )
+
+    for _, elem in context:
+        elem.getparent().remove(elem)
+        yield elem
+
+
+def _xmltv_time_bounds(suffix, instants):
+    """
+    Formatea los instantes como timestamps XMLTV con el mismo sufijo de zona
+    horaria que usa el EPG (' +HHMM', o '' para UTC), de modo que start/stop
+    se puedan comparar como cadenas. Devuelve None si el sufijo no es válido.
+    """
+    if suffix == "":
+        tz = timezone.utc
+    elif len(suffix) == 6 and suffix[0] == " " and suffix[1] in "+-" and suffix[2:].isdigit():
+        try:
+            tz = _xmltv_timezone(suffix[1], suffix[2:4], suffix[4:6])
+        except ValueError:
+            return None
+    else:
+        return None
+
+    return [instant.astimezone(tz).strftime("%Y%m%d%H%M%S") + suffix for instant in instants]
+
 
-    for program in epg_root.findall("programme"):
+def get_filtered_programs(programs, hours_limits):
+    """
+    Reparte en una sola pasada los elementos <programme> entre los marcos
+    de tiempo especificados y devuelve un dict {horas: [programas]}.
+    Todos los marcos comparten el mismo instante de referencia.
+    """
+    # Sin microsegundos, para que comparar cadenas y datetimes dé lo mismo
+    now_utc = datetime.now(timezone.utc).replace(microsecond=0)
+    # De mayor a menor: si un programa no entra en un marco, tampoco en los menores
+    hours_sorted = sorted(hours_limits, reverse=True)
+    limit_times = [now_utc + timedelta(hours=hours) for hours in hours_sorted]
+    programs_by_window = {hours: [] for hours in hours_sorted}
+    programs_total = 0
+
+    # Límites ya formateados por sufijo de zona horaria (normalmente solo uno)
+    bounds_by_suffix = {}
+
+    for program in programs:
+        programs_total += 1
         start_str = program.get("start")
         stop_str = program.get("stop")
         
         if not start_str or not stop_str:
-            programs_filtered += 1
             continue
 
-        start_time = parse_xmltv_time(start_str)
-        stop_time = parse_xmltv_time(stop_str)
+        # Camino rápido: 14 dígitos y misma zona horaria -> comparación directa de cadenas
+        suffix = start_str[14:]
+        bounds = None
+        if (
+            len(start_str) >= 14 and len(stop_str) >= 14 and suffix == stop_str[14:]
+            and start_str[:14].isdigit() and stop_str[:14].isdigit()
+        ):
+            if suffix not in bounds_by_suffix:
+                bounds_by_suffix[suffix] = _xmltv_time_bounds(suffix, [now_utc] + limit_times)
+            bounds = bounds_by_suffix[suffix]
+
+        if bounds is not None:
+            start_key, stop_key = start_str, stop_str
+            now_key, limit_keys = bounds[0], bounds[1:]
+        else:
+            start_key = parse_xmltv_time(start_str)
+            stop_key = parse_xmltv_time(stop_str)
+            if not start_key or not stop_key:
+                continue
+            now_key, limit_keys = now_utc, limit_times
 
-        if not start_time or not stop_time:
-            programs_filtered += 1
+        if stop_key <= now_key:
             continue
 
-        if stop_time > now_utc and start_time < limit_time_utc:
-            programs_list.append(program)
-            programs_kept += 1
-        else:
-            programs_filtered += 1
+        for hours, limit_key in zip(hours_sorted, limit_keys):
+            if start_key >= limit_key:
+                break
+            programs_by_window[hours].append(program)
     
-    print(f"  -> Filtro de {hours_limit}h: {programs_kept} programas conservados, {programs_filtered} programas descartados.")
-    return programs_list
+    for hours in hours_sorted:
+        programs_kept = len(programs_by_window[hours])
+        print(f"  -> Filtro de {hours}h: {programs_kept} programas conservados, {programs_total - programs_kept} programas descartados.")
+    return programs_by_window
+
+
+def build_station_index(channel_data):
+    """
+    Recorre una sola vez los grupos del w3u y devuelve un dict ordenado
+    {epgId: (group_title, station)} sin estaciones repetidas ni sin epgId.
+    """
+    station_index = {}
+    for group in channel_data.get("groups", []):
+        group_title = group.get("name", "Sin Grupo")
+        for station in group.get("stations", []):
+            tvg_id = station.get("epgId")
+            if tvg_id and tvg_id not in station_index:
+                station_index[tvg_id] = (group_title, station)
+    return station_index
+
+
+# Comillas y saltos de línea romperían una entrada #EXTINF
+_M3U_ATTR_TABLE = str.maketrans({'"': "&quot;", "\r": " ", "\n": " "})
+_M3U_TITLE_TABLE = str.maketrans({"\r": " ", "\n": " "})
 
 
 def generate_m3u(data):
     """Genera un único archivo M3U con la URL absoluta del EPG."""
     print(f"Generando {M3U_FILE}...")
-    with open(M3U_FILE, "w", encoding="utf-8") as f:
-        f.write(f'#EXTM3U x-tvg-url="{EPG_FINAL_URL}"\n')
+    lines = [f'#EXTM3U x-tvg-url="{EPG_FINAL_URL}"']
+
+    for group in data.get("groups", []):
+        group_title = str(group.get("name", "Sin Grupo")).translate(_M3U_ATTR_TABLE)
+
+        for station in group.get("stations", []):
+            name = station.get("name")
+            tvg_id = station.get("epgId")
+            logo = station.get("image")
+            stream_url = station.get("url")
 
-        for group in data.get("groups", []):
-            group_title = group.get("name", "Sin Grupo")
+            if not name or not stream_url or not tvg_id:
+                continue
 
-            for station in group.get("stations", []):
-                name = station.get("name")
-                tvg_id = station.get("epgId")
-                logo = station.get("image")
-                stream_url = station.get("url")
+            tvg_id = str(tvg_id).translate(_M3U_ATTR_TABLE)
+            logo = str(logo).translate(_M3U_ATTR_TABLE)
+            name = str(name).translate(_M3U_TITLE_TABLE)
 
-                if not name or not stream_url or not tvg_id:
-                    continue
+            lines.append(f'#EXTINF:-1 tvg-id="{tvg_id}" tvg-logo="{logo}" group-title="{group_title}",{name}')
+            lines.append(str(stream_url).translate(_M3U_TITLE_TABLE).strip())
 
-                f.write(f'#EXTINF:-1 tvg-id="{tvg_id}" tvg-logo="{logo}" group-title="{group_title}",{name}\n')
-                f.write(f'{stream_url}\n')
+    # Una sola escritura (en bytes UTF-8) con toda la lista
+    with atomic_open(M3U_FILE) as f:
+        f.write(("\n".join(lines) + "\n").encode("utf-8"))
 
 
-def generate_xmltv(channel_data, filtered_programs_24h):
+def generate_xmltv(station_index, filtered_programs_24h):
     """
     Genera un archivo XMLTV (24h) combinando canales
     y la lista de programas ya filtrada.
@@ -133,28 +335,26 @@ def generate_xmltv(channel_data, filtered_programs_24h):
     tv_root = ET.Element("tv")
     tv_root.set("generator-info-name", "RakutenGenerator")
 
-    channel_ids = set()
-
-    # 1. Añadir todos los elementos <channel>
-    for group in channel_data.get("groups", []):
-        for station in group.get("stations", []):
-            tvg_id = station.get("epgId")
-            name = station.get("name")
-            logo = station.get("image")
-
-            if not tvg_id or tvg_id in channel_ids:
-                continue
-            
-            channel_ids.add(tvg_id)
-            ch_element = ET.SubElement(tv_root, "channel")
+    # 1. Añadir todos los elementos <channel>. lxml valida cada valor al asignarlo
+    #    (caracteres de control, tipos no str): un canal inválido se omite sin
+    #    impedir que se genere el resto del archivo.
+    for tvg_id, (_, station) in station_index.items():
+        try:
+            ch_element = ET.Element("channel")
             ch_element.set("id", tvg_id)
             
             display_name = ET.SubElement(ch_element, "display-name")
-            display_name.text = name
+            display_name.text = station.get("name")
             
+            logo = station.get("image")
             if logo:
                 icon = ET.SubElement(ch_element, "icon")
                 icon.set("src", logo)
+        except (ValueError, TypeError) as e:
+            print(f"ADVERTENCIA: Canal {tvg_id!r} omitido del XMLTV, datos no válidos. {e}")
+            continue
+
+        tv_root.append(ch_element)
     
     # 2. Añadir los programas de 24h (ya filtrados)
     for program in filtered_programs_24h:
@@ -162,65 +362,84 @@ def generate_xmltv(channel_data, filtered_programs_24h):
 
     # 3. Guardar el archivo XML
     try:
-        xml_str = minidom.parseString(ET.tostring(tv_root)).toprettyxml(indent="  ", encoding="utf-8")
-        with open(XML_FILE, "wb") as f:
-            f.write(xml_str)
+        with atomic_open(XML_FILE) as f:
+            ET.ElementTree(tv_root).write(f, encoding="utf-8", xml_declaration=True, pretty_print=True)
     except Exception as e:
         print(f"ERROR: No se pudo guardar el archivo XML. {e}")
 
 
-def generate_stations_json(channel_data, filtered_programs_12h):
+def _program_title_desc(program):
     """
-    Genera un archivo JSON con la lista de estaciones,
-    incluyendo el EPG de 12h integrado y la URL del EPG.
+    Devuelve (title, desc) de un <programme> recorriendo sus hijos una sola vez.
+    Igual que findtext: None si falta el hijo y "" si existe pero está vacío.
     """
-    print(f"Generando {JSON_STATIONS_FILE} (con EPG de 12h integrado)...")
-    
-    # 1. Crear un mapa de programas (channel_id -> [lista de programas])
-    program_map = {}
+    title = desc = None
+    for child in program.iterchildren("title", "desc"):
+        if child.tag == "title":
+            if title is None:
+                title = child.text or ""
+        elif desc is None:
+            desc = child.text or ""
+        if title is not None and desc is not None:
+            break
+    return title, desc
+
+
+def build_program_map(filtered_programs_12h):
+    """
+    Crea un mapa de programas (channel_id -> [lista de programas]) con los
+    datos que necesita el JSON de estaciones, sin conservar los elementos XML.
+    """
+    program_map = defaultdict(list)
     for program in filtered_programs_12h:
         channel_id = program.get("channel")
         if not channel_id:
             continue
         
+        title, desc = _program_title_desc(program)
         program_dict = {
             "start": program.get("start"),
             "stop": program.get("stop"),
-            "title": program.findtext("title"),
-            "desc": program.findtext("desc")
+            "title": title,
+            "desc": desc
         }
-        
-        if channel_id not in program_map:
-            program_map[channel_id] = []
         program_map[channel_id].append(program_dict)
+    return program_map
 
-    # 2. Construir la lista de estaciones
-    station_list = []
-    channel_ids_seen = set()
-    
-    for group in channel_data.get("groups", []):
-        group_title = group.get("name", "Sin Grupo")
-        for station in group.get("stations", []):
-            tvg_id = station.get("epgId")
-            
-            if not tvg_id or tvg_id in channel_ids_seen:
-                continue
-            channel_ids_seen.add(tvg_id)
-            
-            flat_station = station.copy()
-            flat_station["group_title"] = group_title
-            flat_station["epg"] = program_map.get(tvg_id, [])
-            station_list.append(flat_station)
-    
-    # 3. Crear el objeto JSON final
-    final_json_data = {
-        "epg_xmltv_url": EPG_FINAL_URL,
-        "stations": station_list
-    }
 
-    # 4. Guardar el archivo JSON
-    with open(JSON_STATIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(final_json_data, f, indent=2, ensure_ascii=False)
+def generate_stations_json(station_index, program_map):
+    """
+    Genera un archivo JSON con la lista de estaciones,
+    incluyendo el EPG de 12h integrado y la URL del EPG.
+    """
+    print(f"Generando {JSON_STATIONS_FILE} (con EPG de 12h integrado)...")
+
+    # 1. Escribir el JSON estación a estación, sin construir el documento completo en memoria.
+    #    Con sangría, cada registro se desplaza al nivel de "stations"
+    #    (JSON no admite saltos de línea literales dentro de cadenas, así que es seguro).
+    if PRETTY_JSON:
+        head = b'{\n  "epg_xmltv_url": ' + orjson.dumps(EPG_FINAL_URL) + b',\n  "stations": ['
+        item_prefix, item_separator = b"\n    ", b",\n    "
+        tail = b"\n  ]\n}\n" if station_index else b"]\n}\n"
+    else:
+        head = b'{"epg_xmltv_url":' + orjson.dumps(EPG_FINAL_URL) + b',"stations":['
+        item_prefix, item_separator = b"", b","
+        tail = b"]}\n"
+
+    with atomic_open(JSON_STATIONS_FILE) as f:
+        f.write(head)
+
+        separator = item_prefix
+        for tvg_id, (group_title, station) in station_index.items():
+            record = {**station, "group_title": group_title, "epg": program_map.get(tvg_id, [])}
+            record_json = orjson.dumps(record, option=JSON_DUMP_OPTION)
+            if PRETTY_JSON:
+                record_json = record_json.replace(b"\n", b"\n    ")
+            f.write(separator)
+            f.write(record_json)
+            separator = item_separator
+
+        f.write(tail)
 
 
 # --- FUNCIÓN MODIFICADA ---
@@ -238,44 +457,72 @@ def generate_index_json():
         }
     }
     
-    with open(JSON_INDEX_FILE, "w", encoding="utf-8") as f:
-        json.dump(index_data, f, indent=2, ensure_ascii=False)
+    with atomic_open(JSON_INDEX_FILE) as f:
+        f.write(orjson.dumps(index_data, option=JSON_DUMP_OPTION | orjson.OPT_APPEND_NEWLINE))
 
 
 def main():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-    # 1. Descargar Canales (JSON) y EPG (XML)
-    channel_data = get_data_from_source(SOURCE_URL_W3U)
-    epg_xml_content = get_data_from_source(SOURCE_URL_EPG, is_gz=True)
+    # 1. Descargar Canales (JSON) y EPG (XML) en paralelo
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_channels = executor.submit(get_data_from_source, SOURCE_URL_W3U)
+        future_epg = executor.submit(get_data_from_source, SOURCE_URL_EPG, is_gz=True)
+        channel_data = future_channels.result()
+        epg_stream = future_epg.result()
 
     if not channel_data:
         print("ERROR FATAL: No se pudieron obtener los datos de los canales. Saliendo.")
         return
 
-    epg_root = None
-    if epg_xml_content:
+    # 2. Parsear y filtrar el EPG en streaming, en una sola pasada para AMBAS duraciones
+    programs_by_window = {24: [], 12: []}
+    epg_ok = False
+    if epg_stream is not None:
+        print("Filtrando EPG...")
         try:
-            epg_root = ET.fromstring(epg_xml_content)
-        except ET.ParseError as e:
+            programs_by_window = get_filtered_programs(iter_epg_programs(epg_stream), (24, 12))
+            epg_ok = True
+        except (ET.ParseError, OSError, EOFError) as e:
             print(f"ERROR: No se pudo parsear el XML del EPG. {e}")
+        finally:
+            epg_stream.close()
     else:
         print("ADVERTENCIA: No se pudo obtener el EPG.")
-
-    if epg_root is None:
-        epg_root = ET.Element("tv") 
-
-    # 2. Filtrar programas para AMBAS duraciones
-    print("Filtrando EPG...")
-    programs_for_xml_24h = get_filtered_programs(epg_root, 24)
-    programs_for_json_12h = get_filtered_programs(epg_root, 12)
     
-    # 3. Generar todos los archivos
-    generate_m3u(channel_data)
-    generate_xmltv(channel_data, programs_for_xml_24h)
-    generate_stations_json(channel_data, programs_for_json_12h)
-    generate_index_json()
+    # 3. Preparar los datos compartidos en el hilo principal (XMLTV y JSON usan el índice
+    #    de estaciones; el M3U conserva las estaciones repetidas en varios grupos).
+    #    El mapa de programas se extrae antes de que generate_xmltv mueva los elementos.
+    station_index = build_station_index(channel_data)
+    program_map = build_program_map(programs_by_window[12])
+
+    # 4. Decidir qué archivos se generan antes de lanzar los hilos, para que los avisos
+    #    no se mezclen con su salida. Sin EPG, se conservan el XMLTV y el JSON de la
+    #    ejecución anterior en lugar de vaciarlos.
+    writers = [(generate_m3u, (channel_data,))]
+
+    if epg_ok or not os.path.exists(XML_FILE):
+        writers.append((generate_xmltv, (station_index, programs_by_window[24])))
+    else:
+        print(f"ADVERTENCIA: Sin EPG, se conserva el {XML_FILE} anterior.")
+
+    if epg_ok or not os.path.exists(JSON_STATIONS_FILE):
+        writers.append((generate_stations_json, (station_index, program_map)))
+    else:
+        print(f"ADVERTENCIA: Sin EPG, se conserva el {JSON_STATIONS_FILE} anterior.")
+
+    writers.append((generate_index_json, ()))
+
+    # 5. Generar los archivos en paralelo (son independientes entre sí). Un fallo
+    #    en un generador se informa sin impedir que se guarden los demás archivos.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [(writer, executor.submit(writer, *args)) for writer, args in writers]
+        for writer, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"ERROR: Falló {writer.__name__}. {e}")
     
     print("\n¡Proceso completado!")
 